@@ -1,5 +1,128 @@
 import anthropic
-from typing import List, Optional, Dict, Any
+import asyncio
+import functools
+import hashlib
+import httpx
+import re
+import threading
+import time
+from collections import ChainMap, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Any, Tuple, Generator, Callable, NamedTuple
+from response_cache import SemanticResponseCache
+
+# Anthropic clients shared per (API key, sync/async), so every AIGenerator reuses one
+# pool of keep-alive connections instead of paying TCP/TLS setup for a fresh client
+_CLIENT_CACHE: Dict[Tuple[str, bool], Any] = {}
+_CLIENT_CACHE_LOCK = threading.Lock()
+_POOL_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+
+
+def _get_client(api_key: str, asynchronous: bool = False):
+    """Return the shared (Async)Anthropic client for an API key, creating it on first use"""
+    with _CLIENT_CACHE_LOCK:
+        client = _CLIENT_CACHE.get((api_key, asynchronous))
+        if client is None:
+            if asynchronous:
+                client = anthropic.AsyncAnthropic(
+                    api_key=api_key,
+                    http_client=anthropic.DefaultAsyncHttpxClient(limits=_POOL_LIMITS),
+                    timeout=60.0
+                )
+            else:
+                client = anthropic.Anthropic(
+                    api_key=api_key,
+                    http_client=anthropic.DefaultHttpxClient(limits=_POOL_LIMITS),
+                    timeout=60.0
+                )
+            _CLIENT_CACHE[(api_key, asynchronous)] = client
+        return client
+
+
+# Fallback and error texts returned in place of an answer
+_EMPTY_RESP = "I received your request but the response was empty."
+_NO_TEXT = "I received your request but couldn't generate a text response."
+_AUTH_ERR = "Authentication error: Please check your API key configuration."
+_RATE_LIMIT_ERR = "Rate limit exceeded. Please try again in a moment."
+_TRUNCATION_MARKER = "\n[...truncated for context]"
+
+# Prefixes of tool results that report a failure instead of data. Answers built
+# on them (e.g. "search is unavailable") must not outlive the outage in a cache
+_TOOL_FAILURE_PREFIXES = ("Tool execution error", "Error executing tool", "Search error")
+
+# JSON Schema primitive types used in tool input schemas
+_JSON_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "object": dict,
+    "array": list
+}
+
+
+def _compile_input_validator(schema: Dict[str, Any]) -> Callable[[Any], Optional[str]]:
+    """
+    Compile a tool input_schema into a checker returning an error message or None.
+
+    Covers what tool definitions here use: an object with typed properties and
+    required keys. Undeclared keys are rejected because tool execute() methods
+    only accept their declared parameters.
+    """
+    properties = schema.get("properties", {})
+    required = tuple(schema.get("required", ()))
+    expected_types = {
+        name: _JSON_TYPES[prop["type"]]
+        for name, prop in properties.items()
+        # Union types such as ["string", "null"] are lists and go unchecked
+        if isinstance(prop.get("type"), str) and prop["type"] in _JSON_TYPES
+    }
+
+    def validate(tool_input: Any) -> Optional[str]:
+        if not isinstance(tool_input, dict):
+            return "input must be an object"
+        missing = [name for name in required if name not in tool_input]
+        if missing:
+            return f"missing required argument(s): {', '.join(missing)}"
+        for name, value in tool_input.items():
+            if name not in properties:
+                return f"unexpected argument '{name}'"
+            expected = expected_types.get(name)
+            # bool is an int subclass, but JSON booleans are not integers/numbers
+            if expected is not None and (
+                not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool)
+            ):
+                return f"argument '{name}' must be of type {properties[name]['type']}"
+        return None
+
+    return validate
+
+
+@functools.lru_cache(maxsize=128)
+def _history_block(conversation_history: str, max_chars: int) -> Dict[str, Any]:
+    """
+    Build the uncached system block holding the most recent conversation turns.
+
+    Prefill cost grows with context length, so the oldest turns are dropped
+    once the history exceeds max_chars. The cut is moved to the next
+    "User:"/"Assistant:" line so no partial turn is sent. Memoized because the
+    same history is rebuilt for every retry and cache-miss query in a session;
+    callers must treat the returned block as read-only.
+    """
+    if len(conversation_history) > max_chars:
+        tail = conversation_history[-max_chars:]
+        turn_start = re.search(r"\n(?=(?:User|Assistant): )", tail)
+        conversation_history = tail[turn_start.end():] if turn_start else tail
+    return {"type": "text", "text": f"Previous conversation:\n{conversation_history}"}
+
+
+class _CacheKey(NamedTuple):
+    """Identifies a generation request in the response caches"""
+    exact: str                           # Hash of prompt, history and tool names
+    question: str                        # Text the semantic cache embeds
+    conversation_history: Optional[str]
+    tools_signature: str                 # Comma-joined names of the offered tools
+
 
 class AIGenerator:
     """Handles interactions with Anthropic's Claude API for generating responses"""
@@ -7,6 +130,18 @@ class AIGenerator:
     # Maximum number of sequential tool-calling rounds per query
     MAX_TOOL_ROUNDS = 2
 
+    # Maximum number of exact-match responses kept in memory (LRU)
+    EXACT_CACHE_SIZE = 2000
+
+    # Approximate token budget (~4 characters per token) for conversation history
+    MAX_HISTORY_TOKENS = 2000
+
+    # Maximum characters of a tool result passed back to Claude
+    MAX_TOOL_RESULT_CHARS = 4000
+
+    # Seconds between status polls while a message batch is processing
+    BATCH_POLL_SECONDS = 20.0
+
     # Static system prompt to avoid rebuilding on each call
     SYSTEM_PROMPT = """ You are an AI assistant specialized in course materials and educational content with access to search and outline tools for course information.
 
@@ -44,10 +179,38 @@ All responses must be:
 4. **Example-supported** - Include relevant examples when they aid understanding
 Provide only the direct answer to what was asked.
 """
-    
-    def __init__(self, api_key: str, model: str):
-        self.client = anthropic.Anthropic(api_key=api_key)
+
+    # Prompt-caching marker for the static request prefix (system prompt, tool definitions)
+    CACHE_CONTROL = {"type": "ephemeral"}
+
+    # Static request pieces built once at class load instead of on every call
+    SYSTEM_BLOCK = {"type": "text", "text": SYSTEM_PROMPT, "cache_control": CACHE_CONTROL}
+    TOOL_CHOICE_AUTO = {"type": "auto"}
+
+    # Prefixes of fallback and error texts that must never be stored in the response cache
+    NON_ANSWER_PREFIXES = (
+        "I received your request but",
+        "API error during tool round",
+        "Error in tool round"
+    )
+
+    def __init__(self, api_key: str, model: str,
+                 response_cache: Optional[SemanticResponseCache] = None):
+        self.client = _get_client(api_key)
+        self.aclient = _get_client(api_key, asynchronous=True)
         self.model = model
+        self.response_cache = response_cache
+
+        # Cache-marked tool definitions registered via configure_tools()
+        self._tools_payload: Optional[List[Dict[str, Any]]] = None
+
+        # Compiled input_schema checkers by tool name, built once per tool
+        self._input_validators: Dict[str, Callable[[Any], Optional[str]]] = {}
+
+        # Exact-match cache: temperature 0 makes identical inputs give identical outputs
+        # Entries are (response, sources the response was based on)
+        self._exact_cache: "OrderedDict[str, Tuple[str, List[Dict[str, Any]]]]" = OrderedDict()
+        self._exact_cache_lock = threading.Lock()
         
         # Pre-build base API parameters
         self.base_params = {
@@ -59,7 +222,8 @@ Provide only the direct answer to what was asked.
     def generate_response(self, query: str,
                          conversation_history: Optional[str] = None,
                          tools: Optional[List] = None,
-                         tool_manager=None) -> str:
+                         tool_manager=None,
+                         question: Optional[str] = None) -> str:
         """
         Generate AI response with optional tool usage and conversation context.
 
@@ -68,29 +232,23 @@ Provide only the direct answer to what was asked.
             conversation_history: Previous messages for context
             tools: Available tools the AI can use
             tool_manager: Manager to execute tools
+            question: The user's question without prompt framing, matched by
+                      the semantic cache (defaults to query)
 
         Returns:
             Generated response as string, or error message on failure
         """
+        # Fall back to the tools registered via configure_tools()
+        if tools is None:
+            tools = self._tools_payload
 
-        # Build system content efficiently - avoid string ops when possible
-        system_content = (
-            f"{self.SYSTEM_PROMPT}\n\nPrevious conversation:\n{conversation_history}"
-            if conversation_history
-            else self.SYSTEM_PROMPT
-        )
-
-        # Prepare API call parameters efficiently
-        api_params = {
-            **self.base_params,
-            "messages": [{"role": "user", "content": query}],
-            "system": system_content
-        }
+        # Serve repeated and semantically equivalent queries without an API round-trip
+        cache_key = self._cache_key(query, conversation_history, tools, question)
+        cache_vector, cached = self._lookup_cached(cache_key, tool_manager)
+        if cached is not None:
+            return cached
 
-        # Add tools if available
-        if tools:
-            api_params["tools"] = tools
-            api_params["tool_choice"] = {"type": "auto"}
+        api_params, tools = self._build_api_params(query, conversation_history, tools)
 
         try:
             # Get response from Claude
@@ -98,19 +256,353 @@ Provide only the direct answer to what was asked.
 
             # Handle tool execution if needed
             if response.stop_reason == "tool_use" and tool_manager:
-                return self._handle_tool_execution(response, api_params, tool_manager, tools)
+                result = self._handle_tool_execution(response, api_params, tool_manager, tools)
+            else:
+                # Direct response with content validation
+                result = self._extract_text_response(response)
 
-            # Return direct response with content validation
-            return self._extract_text_response(response)
+            self._store_response(cache_key, result, tool_manager, cache_vector, api_params["messages"])
+            return result
 
-        except anthropic.AuthenticationError as e:
-            return f"Authentication error: Please check your API key configuration."
-        except anthropic.RateLimitError as e:
-            return f"Rate limit exceeded. Please try again in a moment."
-        except anthropic.APIError as e:
-            return f"API error occurred: {str(e)}"
         except Exception as e:
-            return f"An unexpected error occurred: {str(e)}"
+            return self._format_error(e)
+
+    async def agenerate_response(self, query: str,
+                                 conversation_history: Optional[str] = None,
+                                 tools: Optional[List] = None,
+                                 tool_manager=None,
+                                 question: Optional[str] = None) -> str:
+        """
+        Async variant of generate_response using AsyncAnthropic.
+
+        Awaiting Claude instead of blocking lets concurrent requests share one
+        event loop; tool calls and query embedding run in worker threads.
+
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools: Available tools the AI can use
+            tool_manager: Manager to execute tools
+            question: The user's question without prompt framing, matched by
+                      the semantic cache (defaults to query)
+
+        Returns:
+            Generated response as string, or error message on failure
+        """
+        if tools is None:
+            tools = self._tools_payload
+
+        cache_key = self._cache_key(query, conversation_history, tools, question)
+        cache_vector, cached = await asyncio.to_thread(self._lookup_cached, cache_key, tool_manager)
+        if cached is not None:
+            return cached
+
+        api_params, tools = self._build_api_params(query, conversation_history, tools)
+
+        try:
+            response = await self.aclient.messages.create(**api_params)
+
+            if response.stop_reason == "tool_use" and tool_manager:
+                result = await self._ahandle_tool_execution(response, api_params, tool_manager, tools)
+            else:
+                result = self._extract_text_response(response)
+
+            self._store_response(cache_key, result, tool_manager, cache_vector, api_params["messages"])
+            return result
+
+        except Exception as e:
+            return self._format_error(e)
+
+    def generate_response_stream(self, query: str,
+                                 conversation_history: Optional[str] = None,
+                                 tools: Optional[List] = None,
+                                 tool_manager=None,
+                                 question: Optional[str] = None) -> Generator[str, None, str]:
+        """
+        Stream the AI response as text deltas instead of waiting for the full completion.
+
+        Text is yielded as soon as Claude produces it, so perceived latency is the
+        time to first token. When a streamed turn ends in tool_use, the tools are
+        executed and the next round is streamed, up to MAX_TOOL_ROUNDS.
+
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools: Available tools the AI can use
+            tool_manager: Manager to execute tools
+            question: The user's question without prompt framing, matched by
+                      the semantic cache (defaults to query)
+
+        Yields:
+            Response text chunks, or a single error message on failure
+
+        Returns:
+            The answer text as the blocking path would return it: the final
+            round's text without preamble from earlier tool_use rounds
+        """
+        if tools is None:
+            tools = self._tools_payload
+
+        cache_key = self._cache_key(query, conversation_history, tools, question)
+        cache_vector, cached = self._lookup_cached(cache_key, tool_manager)
+        if cached is not None:
+            yield cached
+            return cached
+
+        api_params, tools = self._build_api_params(query, conversation_history, tools)
+        messages = api_params["messages"]
+        params = api_params
+        round_count = 0
+        cached_index = None
+
+        try:
+            while True:
+                round_streamed = False
+                with self.client.messages.stream(**params) as stream:
+                    for text in stream.text_stream:
+                        round_streamed = True
+                        yield text
+                    response = stream.get_final_message()
+
+                if response.stop_reason != "tool_use" or not tool_manager or round_count >= self.MAX_TOOL_ROUNDS:
+                    break
+
+                round_count += 1
+                tool_blocks = self._tool_use_blocks(response.content)
+                tool_outputs = self._execute_tools(tool_blocks, tool_manager)
+                tool_error_occurred = any(failed for _, failed in tool_outputs)
+                allow_more_tools = (round_count < self.MAX_TOOL_ROUNDS) and not tool_error_occurred
+                cache_tail = allow_more_tools and round_count + 1 < self.MAX_TOOL_ROUNDS
+                cached_index = self._append_tool_round(
+                    messages, response, tool_blocks, tool_outputs, cached_index, cache_tail
+                )
+                params = self._next_round_params(messages, api_params, tools, allow_more_tools)
+
+        except Exception as e:
+            error = self._format_error(e)
+            yield error
+            return error
+
+        final_text = self._extract_text_response(response)
+        if not round_streamed:
+            # The final round streamed no text - fall back to the same message as the blocking path
+            yield final_text
+            return final_text
+
+        # Cache what the blocking path returns for this request: the final round's
+        # text, without any preamble streamed during earlier tool_use rounds
+        self._store_response(cache_key, final_text, tool_manager, cache_vector, messages)
+        return final_text
+
+    def generate_batch(self, queries: Dict[str, str], use_batch: bool = True,
+                       poll_interval: Optional[float] = None) -> Dict[str, str]:
+        """
+        Generate responses for many independent queries via the Message Batches API.
+
+        Batches are billed at half price but complete asynchronously, so this is
+        meant for latency-insensitive workloads such as evaluation runs. Tools are
+        not offered, since a tool round needs a follow-up call per query.
+
+        Args:
+            queries: Mapping of custom_id to query text
+            use_batch: If False, fall back to one generate_response call per query
+            poll_interval: Seconds between status polls (defaults to BATCH_POLL_SECONDS)
+
+        Returns:
+            Mapping of custom_id to response text or error message
+        """
+        if not use_batch:
+            return {custom_id: self.generate_response(query, tools=[]) for custom_id, query in queries.items()}
+
+        requests = [
+            {"custom_id": custom_id, "params": dict(self._build_api_params(query, None, None)[0])}
+            for custom_id, query in queries.items()
+        ]
+        poll_interval = self.BATCH_POLL_SECONDS if poll_interval is None else poll_interval
+
+        try:
+            batch = self.client.messages.batches.create(requests=requests)
+            while batch.processing_status != "ended":
+                time.sleep(poll_interval)
+                batch = self.client.messages.batches.retrieve(batch.id)
+
+            results = {}
+            for entry in self.client.messages.batches.results(batch.id):
+                if entry.result.type == "succeeded":
+                    result = self._extract_text_response(entry.result.message)
+                    self._store_response(self._cache_key(queries[entry.custom_id], None, None), result)
+                else:
+                    result = f"API error occurred: batch request {entry.result.type}"
+                results[entry.custom_id] = result
+            return results
+
+        except Exception as e:
+            error = self._format_error(e)
+            return {custom_id: error for custom_id in queries}
+
+    def _build_api_params(self, query: str,
+                          conversation_history: Optional[str],
+                          tools: Optional[List]) -> Tuple[ChainMap, Optional[List]]:
+        """
+        Build the initial Messages API parameters for a query.
+
+        Returns:
+            Tuple of (API parameters layered over base_params, cache-marked tools or None)
+        """
+        # Build system blocks - static prompt is cached, history is not
+        system_content = self._build_system_blocks(conversation_history)
+
+        # Layer request fields over the shared base params; writes go to the
+        # request layer, and ** unpacking at the SDK call is the only copy
+        api_params = ChainMap({
+            "messages": [{"role": "user", "content": query}],
+            "system": system_content
+        }, self.base_params)
+
+        # Add tools if available, marked so their schemas share the prompt cache
+        if tools:
+            if tools is not self._tools_payload:
+                tools = self._with_tool_cache(tools)
+            for tool in tools:
+                if tool["name"] not in self._input_validators and "input_schema" in tool:
+                    self._input_validators[tool["name"]] = _compile_input_validator(tool["input_schema"])
+            api_params["tools"] = tools
+            api_params["tool_choice"] = self.TOOL_CHOICE_AUTO
+
+        return api_params, tools
+
+    @staticmethod
+    def _format_error(error: Exception) -> str:
+        """Map an exception from the API call to a user-facing error message"""
+        if isinstance(error, anthropic.AuthenticationError):
+            return _AUTH_ERR
+        if isinstance(error, anthropic.RateLimitError):
+            return _RATE_LIMIT_ERR
+        if isinstance(error, anthropic.APIError):
+            return f"API error occurred: {error}"
+        return f"An unexpected error occurred: {error}"
+
+    def configure_tools(self, tools: List[Dict[str, Any]]):
+        """
+        Register default tool definitions, pre-marked for prompt caching once.
+
+        Calls that pass tools=None use these instead of rebuilding the payload.
+
+        Args:
+            tools: Anthropic tool definitions
+        """
+        self._tools_payload = self._with_tool_cache(tools) if tools else None
+
+    def clear_cache(self):
+        """Drop all cached responses (e.g. after the course catalog changes)"""
+        with self._exact_cache_lock:
+            self._exact_cache.clear()
+        if self.response_cache is not None:
+            self.response_cache.clear()
+
+    @staticmethod
+    def _cache_key(query: str, conversation_history: Optional[str], tools: Optional[List],
+                   question: Optional[str] = None) -> _CacheKey:
+        """Build the response-cache key for a request from its inputs and offered tool names"""
+        tools_signature = ",".join(tool.get("name", "") for tool in tools or [])
+        key_source = "|".join((query, conversation_history or "", tools_signature))
+        exact = hashlib.blake2b(key_source.encode(), digest_size=16).hexdigest()
+        return _CacheKey(exact, question or query, conversation_history, tools_signature)
+
+    def _lookup_cached(self, cache_key: _CacheKey, tool_manager=None) -> Tuple[Any, Optional[str]]:
+        """
+        Look up a cached answer, trying the exact-match cache before the semantic one.
+
+        No tool runs on a hit, so the sources stored with the answer are
+        restored on the tool manager for the caller to read.
+
+        Returns:
+            Tuple of (question embedding to reuse when storing, or None;
+            cached response text or None)
+        """
+        cached = self._lookup_exact(cache_key.exact)
+        cache_vector = None
+        if cached is None and self.response_cache is not None:
+            cache_vector, cached = self.response_cache.lookup(
+                cache_key.question, cache_key.conversation_history, cache_key.tools_signature
+            )
+        if cached is None:
+            return cache_vector, None
+        response, sources = cached
+        if tool_manager is not None:
+            tool_manager.restore_sources(sources)
+        return cache_vector, response
+
+    def _lookup_exact(self, key: str) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """Return the exact-match cached (response, sources) for a key, if any"""
+        with self._exact_cache_lock:
+            cached = self._exact_cache.get(key)
+            if cached is not None:
+                self._exact_cache.move_to_end(key)
+            return cached
+
+    def _store_response(self, cache_key: _CacheKey, response: str, tool_manager=None,
+                        cache_vector=None, messages: List[Dict[str, Any]] = ()):
+        """
+        Store a genuine answer, with the sources it was based on, in the response caches.
+
+        Args:
+            cache_key: Key from _cache_key() for the request
+            response: Final response text
+            tool_manager: Manager whose sources the response was based on
+            cache_vector: Question embedding from the semantic-cache lookup
+            messages: Messages sent for the request, checked for failed tool results
+        """
+        if response.startswith(self.NON_ANSWER_PREFIXES) or self._tool_failed(messages):
+            return
+
+        sources = list(tool_manager.get_last_sources()) if tool_manager is not None else []
+        with self._exact_cache_lock:
+            self._exact_cache[cache_key.exact] = (response, sources)
+            self._exact_cache.move_to_end(cache_key.exact)
+            while len(self._exact_cache) > self.EXACT_CACHE_SIZE:
+                self._exact_cache.popitem(last=False)
+
+        if self.response_cache is not None:
+            self.response_cache.put(
+                cache_key.question, cache_key.conversation_history, response,
+                sources=sources, tools_signature=cache_key.tools_signature, vector=cache_vector
+            )
+
+    @staticmethod
+    def _tool_failed(messages: List[Dict[str, Any]]) -> bool:
+        """Whether any tool result sent during a request reported a failure"""
+        return any(
+            block.get("type") == "tool_result"
+            and isinstance(block.get("content"), str)
+            and block["content"].startswith(_TOOL_FAILURE_PREFIXES)
+            for message in messages
+            if message["role"] == "user" and isinstance(message["content"], list)
+            for block in message["content"]
+        )
+
+    def _build_system_blocks(self, conversation_history: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Build the structured system prompt for the Messages API.
+
+        The static SYSTEM_PROMPT carries a cache breakpoint so repeat calls are
+        served from Anthropic's prompt cache. Conversation history changes every
+        turn, so it goes in a separate, uncached block after the breakpoint.
+
+        Args:
+            conversation_history: Previous messages for context
+
+        Returns:
+            List of system text blocks
+        """
+        if not conversation_history:
+            return [self.SYSTEM_BLOCK]
+        # History is kept to roughly MAX_HISTORY_TOKENS (~4 characters per token)
+        return [self.SYSTEM_BLOCK, _history_block(conversation_history, self.MAX_HISTORY_TOKENS * 4)]
+
+    def _with_tool_cache(self, tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return a copy of tools with a cache breakpoint on the last definition"""
+        return [*tools[:-1], {**tools[-1], "cache_control": self.CACHE_CONTROL}]
 
     def _extract_text_response(self, response) -> str:
         """
@@ -122,17 +614,18 @@ Provide only the direct answer to what was asked.
         Returns:
             Text content from response, or fallback message if not found
         """
-        if response.content and len(response.content) > 0:
-            for block in response.content:
-                if hasattr(block, 'text'):
-                    return block.text
-            return "I received your request but couldn't generate a text response."
-        return "I received your request but the response was empty."
+        if not response.content:
+            return _EMPTY_RESP
+        # Dispatch on block type: one attribute read per block, no hasattr probing
+        return next(
+            (block.text for block in response.content if getattr(block, "type", None) == "text"),
+            _NO_TEXT
+        )
 
     def _handle_tool_execution(
         self,
         initial_response,
-        base_params: Dict[str, Any],
+        base_params: ChainMap,
         tool_manager,
         tools: Optional[List] = None
     ) -> str:
@@ -151,64 +644,33 @@ Provide only the direct answer to what was asked.
         Returns:
             Final response text after all tool rounds complete
         """
-        messages = base_params["messages"].copy()
+        messages = base_params["messages"]  # Request-local list, extended in place
         current_response = initial_response
         round_count = 0
+        cached_index = None  # Message currently holding the tail cache breakpoint
 
         while round_count < self.MAX_TOOL_ROUNDS:
             round_count += 1
 
-            # Add Claude's tool-use response to messages
-            messages.append({"role": "assistant", "content": current_response.content})
-
             # Execute all tool calls from this response and collect results
-            tool_results = []
-            tool_error_occurred = False
-
-            for content_block in current_response.content:
-                if content_block.type == "tool_use":
-                    try:
-                        tool_result = tool_manager.execute_tool(
-                            content_block.name,
-                            **content_block.input
-                        )
-                    except Exception as e:
-                        tool_result = f"Tool execution error: {str(e)}"
-                        tool_error_occurred = True
-
-                    tool_results.append({
-                        "type": "tool_result",
-                        "tool_use_id": content_block.id,
-                        "content": tool_result
-                    })
-
-            # Add tool results as user message
-            if tool_results:
-                messages.append({"role": "user", "content": tool_results})
+            tool_blocks = self._tool_use_blocks(current_response.content)
+            tool_outputs = self._execute_tools(tool_blocks, tool_manager)
 
             # Determine if more tools should be allowed
             # Allow more tools if: not at max rounds AND no critical errors
+            tool_error_occurred = any(failed for _, failed in tool_outputs)
             allow_more_tools = (round_count < self.MAX_TOOL_ROUNDS) and not tool_error_occurred
-
-            # Build API params for next call
-            next_params = {
-                **self.base_params,
-                "messages": list(messages),  # Copy to preserve state for this call
-                "system": base_params["system"]
-            }
-
-            if allow_more_tools and tools:
-                next_params["tools"] = tools
-                next_params["tool_choice"] = {"type": "auto"}
-            # else: no tools parameter, forcing Claude to generate final answer
+            cache_tail = allow_more_tools and round_count + 1 < self.MAX_TOOL_ROUNDS
+            cached_index = self._append_tool_round(
+                messages, current_response, tool_blocks, tool_outputs, cached_index, cache_tail
+            )
+            next_params = self._next_round_params(messages, base_params, tools, allow_more_tools)
 
             # Make the API call
             try:
                 current_response = self.client.messages.create(**next_params)
-            except anthropic.APIError as e:
-                return f"API error during tool round {round_count}: {str(e)}"
             except Exception as e:
-                return f"Error in tool round {round_count}: {str(e)}"
+                return self._format_round_error(round_count, e)
 
             # Check if Claude wants more tools
             if current_response.stop_reason != "tool_use":
@@ -216,4 +678,167 @@ Provide only the direct answer to what was asked.
                 break
 
         # Extract and return final text response
-        return self._extract_text_response(current_response)
\ No newline at end of file
+        return self._extract_text_response(current_response)
+
+    async def _ahandle_tool_execution(
+        self,
+        initial_response,
+        base_params: ChainMap,
+        tool_manager,
+        tools: Optional[List] = None
+    ) -> str:
+        """Async variant of _handle_tool_execution; tool calls in a round run concurrently"""
+        messages = base_params["messages"]  # Request-local list, extended in place
+        current_response = initial_response
+        round_count = 0
+        cached_index = None
+
+        while round_count < self.MAX_TOOL_ROUNDS:
+            round_count += 1
+
+            tool_blocks = self._tool_use_blocks(current_response.content)
+            tool_outputs = await asyncio.gather(
+                *(asyncio.to_thread(self._execute_tool, block, tool_manager) for block in tool_blocks)
+            )
+            tool_error_occurred = any(failed for _, failed in tool_outputs)
+            allow_more_tools = (round_count < self.MAX_TOOL_ROUNDS) and not tool_error_occurred
+            cache_tail = allow_more_tools and round_count + 1 < self.MAX_TOOL_ROUNDS
+            cached_index = self._append_tool_round(
+                messages, current_response, tool_blocks, tool_outputs, cached_index, cache_tail
+            )
+            next_params = self._next_round_params(messages, base_params, tools, allow_more_tools)
+
+            try:
+                current_response = await self.aclient.messages.create(**next_params)
+            except Exception as e:
+                return self._format_round_error(round_count, e)
+
+            if current_response.stop_reason != "tool_use":
+                break
+
+        return self._extract_text_response(current_response)
+
+    def _append_tool_round(self, messages: List[Dict[str, Any]], current_response,
+                           tool_blocks: List, tool_outputs: List[Tuple[str, bool]],
+                           cached_index: Optional[int], cache_tail: bool = True) -> Optional[int]:
+        """
+        Append Claude's tool-use turn and the matching tool results to messages.
+
+        The tail cache breakpoint moves onto the new results so the next round
+        reuses the cached prefix. System and tools already hold two of the four
+        allowed breakpoints, so only the latest results keep one; the previous
+        message is replaced rather than mutated to leave already-sent requests
+        untouched. A breakpoint is only read by a later call with the same
+        prefix, and the final round is sent without tools, so the tail is only
+        marked when the call after next will still carry tools. At the default
+        MAX_TOOL_ROUNDS of 2 that never happens and no tail marker is sent.
+
+        Args:
+            messages: Conversation messages, extended in place
+            current_response: Claude response containing the tool_use blocks
+            tool_blocks: tool_use blocks from that response
+            tool_outputs: (result text, failed) per block, in block order
+            cached_index: Index of the message holding the breakpoint, if any
+            cache_tail: Whether to put the breakpoint on these results
+
+        Returns:
+            Index of the message now holding the tail cache breakpoint
+        """
+        # Add Claude's tool-use response to messages
+        messages.append({"role": "assistant", "content": current_response.content})
+
+        tool_results = [
+            {
+                "type": "tool_result",
+                "tool_use_id": content_block.id,
+                "content": tool_result
+            }
+            for content_block, (tool_result, _) in zip(tool_blocks, tool_outputs)
+        ]
+        if not tool_results:
+            return cached_index
+
+        if cached_index is not None:
+            previous = messages[cached_index]["content"]
+            uncached = {k: v for k, v in previous[-1].items() if k != "cache_control"}
+            messages[cached_index] = {"role": "user", "content": [*previous[:-1], uncached]}
+        if not cache_tail:
+            messages.append({"role": "user", "content": tool_results})
+            return None
+        tool_results[-1]["cache_control"] = self.CACHE_CONTROL
+        messages.append({"role": "user", "content": tool_results})
+        return len(messages) - 1
+
+    def _next_round_params(self, messages: List[Dict[str, Any]], base_params: ChainMap,
+                           tools: Optional[List], allow_more_tools: bool) -> ChainMap:
+        """Build API params for the call following a tool round"""
+        next_params = ChainMap({
+            # The SDK serializes params on the call and keeps no reference, so the
+            # growing list is passed as-is instead of being copied every round
+            "messages": messages,
+            "system": base_params["system"]
+        }, self.base_params)
+
+        if allow_more_tools and tools:
+            next_params["tools"] = tools
+            next_params["tool_choice"] = self.TOOL_CHOICE_AUTO
+        # else: no tools parameter, forcing Claude to generate final answer. The API
+        # rejects tool_choice without tools, so {"type": "none"} is not sent either
+
+        return next_params
+
+    @staticmethod
+    def _format_round_error(round_count: int, error: Exception) -> str:
+        """Map an exception from a tool-round API call to an error message"""
+        if isinstance(error, anthropic.APIError):
+            return f"API error during tool round {round_count}: {error}"
+        return f"Error in tool round {round_count}: {error}"
+
+    @staticmethod
+    def _tool_use_blocks(content: List) -> List:
+        """Return the tool_use blocks of a response's content, in order"""
+        # Common case: Claude replies with a single search call and no text, so
+        # the content list is already the answer and needs no filtering
+        if len(content) == 1 and content[0].type == "tool_use":
+            return content
+        return [block for block in content if block.type == "tool_use"]
+
+    def _execute_tools(self, tool_blocks: List, tool_manager) -> List[Tuple[str, bool]]:
+        """
+        Execute tool_use blocks, concurrently when Claude requested several.
+
+        Args:
+            tool_blocks: tool_use content blocks from a Claude response
+            tool_manager: Manager to execute tools
+
+        Returns:
+            List of (result text, whether execution raised) in block order
+        """
+        if len(tool_blocks) == 1:
+            return [self._execute_tool(tool_blocks[0], tool_manager)]
+        if not tool_blocks:
+            return []
+
+        # Tools do I/O (vector search), so overlapping them cuts wall time to the slowest call
+        with ThreadPoolExecutor(max_workers=len(tool_blocks)) as executor:
+            return list(executor.map(lambda block: self._execute_tool(block, tool_manager), tool_blocks))
+
+    def _execute_tool(self, block, tool_manager) -> Tuple[str, bool]:
+        """Execute one tool_use block, returning (result text, whether execution raised)"""
+        # Reject malformed arguments locally so Claude can correct them next round
+        # without the tool doing any search I/O
+        validate = self._input_validators.get(block.name)
+        if validate is not None:
+            problem = validate(block.input)
+            if problem:
+                return f"Invalid arguments for tool '{block.name}': {problem}", False
+
+        try:
+            result = tool_manager.execute_tool(block.name, **block.input)
+        except Exception as e:
+            return f"Tool execution error: {e}", True
+
+        # Results are re-sent on every later round, so bound their size
+        if isinstance(result, str) and len(result) > self.MAX_TOOL_RESULT_CHARS:
+            result = result[:self.MAX_TOOL_RESULT_CHARS] + _TRUNCATION_MARKER
+        return result, False
\ No newline at end of file
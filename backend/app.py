@@ -5,8 +5,10 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
+import json
 import os
 
 from config import config
@@ -62,8 +64,8 @@ async def query_documents(request: QueryRequest):
         if not session_id:
             session_id = rag_system.session_manager.create_session()
         
-        # Process query using RAG system
-        answer, sources = rag_system.query(request.query, session_id)
+        # Process query using RAG system, awaiting Claude without blocking the event loop
+        answer, sources = await rag_system.aquery(request.query, session_id)
         
         return QueryResponse(
             answer=answer,
@@ -73,6 +75,29 @@ async def query_documents(request: QueryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/query/stream")
+async def query_documents_stream(request: QueryRequest):
+    """Process a query and stream the response as server-sent events"""
+    try:
+        # Create session if not provided
+        session_id = request.session_id
+        if not session_id:
+            session_id = rag_system.session_manager.create_session()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    def event_stream():
+        yield format_sse({"type": "session", "session_id": session_id})
+        for event in rag_system.query_stream(request.query, session_id):
+            yield format_sse(event)
+
+    # Sync generator runs in the threadpool, so generation doesn't block the event loop
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Format one server-sent event, terminated by exactly one blank line"""
+    return f"data: {json.dumps(event)}\n\n"
+
 @app.get("/api/courses", response_model=CourseStats)
 async def get_course_stats():
     """Get course analytics and statistics"""
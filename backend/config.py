@@ -20,6 +20,13 @@ class Config:
     CHUNK_OVERLAP: int = 100     # Characters to overlap between chunks
     MAX_RESULTS: int = 5         # Maximum search results to return
     MAX_HISTORY: int = 2         # Number of conversation messages to remember
+
+    # Response cache settings. The semantic cache is opt-in: embeddings of
+    # course or lesson variants ("lesson 1 of MCP" vs "lesson 2") can fall
+    # within the hit distance and return the other question's answer.
+    RESPONSE_CACHE_ENABLED: bool = False       # Serve semantically similar queries from cache
+    RESPONSE_CACHE_SIZE: int = 5000            # Maximum cached responses (LRU)
+    RESPONSE_CACHE_MAX_DISTANCE: float = 0.1   # Cosine distance for a semantic cache hit
     
     # Database paths
     CHROMA_PATH: str = "./chroma_db"  # ChromaDB storage location
@@ -1,9 +1,10 @@
-from typing import List, Tuple, Optional, Dict
+from typing import List, Tuple, Optional, Dict, Any, Iterator
 import os
 from document_processor import DocumentProcessor
 from vector_store import VectorStore
 from ai_generator import AIGenerator
 from session_manager import SessionManager
+from response_cache import SemanticResponseCache
 from search_tools import ToolManager, CourseSearchTool, CourseOutlineTool
 from models import Course, Lesson, CourseChunk
 
@@ -16,7 +17,12 @@ class RAGSystem:
         # Initialize core components
         self.document_processor = DocumentProcessor(config.CHUNK_SIZE, config.CHUNK_OVERLAP)
         self.vector_store = VectorStore(config.CHROMA_PATH, config.EMBEDDING_MODEL, config.MAX_RESULTS)
-        self.ai_generator = AIGenerator(config.ANTHROPIC_API_KEY, config.ANTHROPIC_MODEL)
+        self.response_cache = SemanticResponseCache(
+            self.vector_store.embedding_function,
+            config.RESPONSE_CACHE_SIZE,
+            config.RESPONSE_CACHE_MAX_DISTANCE
+        ) if config.RESPONSE_CACHE_ENABLED else None
+        self.ai_generator = AIGenerator(config.ANTHROPIC_API_KEY, config.ANTHROPIC_MODEL, self.response_cache)
         self.session_manager = SessionManager(config.MAX_HISTORY)
         
         # Initialize search tools
@@ -25,6 +31,10 @@ class RAGSystem:
         self.tool_manager.register_tool(self.search_tool)
         self.outline_tool = CourseOutlineTool(self.vector_store)
         self.tool_manager.register_tool(self.outline_tool)
+
+        # Tool definitions are static, so mark them for prompt caching once here
+        # rather than rebuilding the payload on every query
+        self.ai_generator.configure_tools(self.tool_manager.get_tool_definitions())
     
     def add_course_document(self, file_path: str) -> Tuple[Course, int]:
         """
@@ -45,6 +55,9 @@ class RAGSystem:
             
             # Add course content chunks to vector store
             self.vector_store.add_course_content(course_chunks)
+
+            # Cached answers may be stale now that the catalog changed
+            self.ai_generator.clear_cache()
             
             return course, len(course_chunks)
         except Exception as e:
@@ -98,6 +111,10 @@ class RAGSystem:
                         print(f"Course already exists: {course.title} - skipping")
                 except Exception as e:
                     print(f"Error processing {file_name}: {e}")
+
+        # Cached answers may be stale now that the catalog changed
+        if clear_existing or total_courses:
+            self.ai_generator.clear_cache()
         
         return total_courses, total_chunks
     
@@ -112,6 +129,62 @@ class RAGSystem:
         Returns:
             Tuple of (response, sources list - empty for tool-based approach)
         """
+        # Track this request's sources apart from any concurrent request
+        tool_manager = self.tool_manager.for_request()
+
+        # Generate response using AI with tools
+        response = self.ai_generator.generate_response(**self._generation_args(query, session_id, tool_manager))
+        
+        return self._finish_query(query, session_id, response, tool_manager)
+
+    async def aquery(self, query: str, session_id: Optional[str] = None) -> Tuple[str, List[str]]:
+        """
+        Async variant of query() that awaits Claude without blocking the event loop.
+        
+        Args:
+            query: User's question
+            session_id: Optional session ID for conversation context
+            
+        Returns:
+            Tuple of (response, sources list)
+        """
+        tool_manager = self.tool_manager.for_request()
+        response = await self.ai_generator.agenerate_response(
+            **self._generation_args(query, session_id, tool_manager)
+        )
+
+        return self._finish_query(query, session_id, response, tool_manager)
+
+    def query_stream(self, query: str, session_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of query() that yields response text as it is generated.
+        
+        Args:
+            query: User's question
+            session_id: Optional session ID for conversation context
+            
+        Yields:
+            {"type": "text", "text": ...} events, then one {"type": "sources", "sources": [...]} event
+        """
+        tool_manager = self.tool_manager.for_request()
+        stream = self.ai_generator.generate_response_stream(
+            **self._generation_args(query, session_id, tool_manager)
+        )
+        while True:
+            try:
+                text = next(stream)
+            except StopIteration as finished:
+                # The generator returns the answer without tool-round preamble,
+                # which is what the session history should record
+                response = finished.value
+                break
+            yield {"type": "text", "text": text}
+
+        _, sources = self._finish_query(query, session_id, response, tool_manager)
+        yield {"type": "sources", "sources": sources}
+
+    def _generation_args(self, query: str, session_id: Optional[str], tool_manager: ToolManager) -> Dict:
+        """Build the AI generator arguments for a user query, using the request's tool manager"""
         # Create prompt for the AI with clear instructions
         prompt = f"""Answer this question about course materials: {query}"""
         
@@ -119,20 +192,23 @@ class RAGSystem:
         history = None
         if session_id:
             history = self.session_manager.get_conversation_history(session_id)
-        
-        # Generate response using AI with tools
-        response = self.ai_generator.generate_response(
-            query=prompt,
-            conversation_history=history,
-            tools=self.tool_manager.get_tool_definitions(),
-            tool_manager=self.tool_manager
-        )
-        
-        # Get sources from the search tool
-        sources = self.tool_manager.get_last_sources()
 
-        # Reset sources after retrieving them
-        self.tool_manager.reset_sources()
+        return {
+            "query": prompt,
+            # The semantic cache embeds the bare question: the shared prompt
+            # framing would pull unrelated questions closer together
+            "question": query,
+            "conversation_history": history,
+            # No "tools": the generator sends the definitions set by configure_tools()
+            "tool_manager": tool_manager
+        }
+
+    def _finish_query(self, query: str, session_id: Optional[str], response: str,
+                      tool_manager: ToolManager) -> Tuple[str, List[str]]:
+        """Collect the request's sources and record the exchange after a response is generated"""
+        # Get sources from the request's search tools; its manager is discarded
+        # afterwards, so there is nothing to reset
+        sources = tool_manager.get_last_sources()
         
         # Update conversation history
         if session_id:
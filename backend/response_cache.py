@@ -0,0 +1,153 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+
+class _ContextIndex:
+    """Embedding matrix for the cache entries sharing one context, updated in place"""
+
+    def __init__(self, dim: int, capacity: int = 8):
+        self.keys: List[Tuple[str, str]] = []
+        self.rows: Dict[Tuple[str, str], int] = {}
+        self.matrix = np.empty((capacity, dim), dtype=np.float32)
+
+    def set(self, key: Tuple[str, str], vector: np.ndarray):
+        """Add or overwrite the row for key, growing the matrix geometrically"""
+        row = self.rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == len(self.matrix):
+                grown = np.empty((2 * len(self.matrix), self.matrix.shape[1]), dtype=np.float32)
+                grown[:row] = self.matrix
+                self.matrix = grown
+            self.keys.append(key)
+            self.rows[key] = row
+        self.matrix[row] = vector
+
+    def remove(self, key: Tuple[str, str]):
+        """Drop key's row by moving the last row into its place"""
+        row = self.rows.pop(key)
+        last_key = self.keys.pop()
+        if last_key != key:
+            self.matrix[row] = self.matrix[len(self.keys)]
+            self.keys[row] = last_key
+            self.rows[last_key] = row
+
+    def nearest(self, vector: np.ndarray) -> Tuple[Tuple[str, str], float]:
+        """Return the closest key and its cosine distance to a unit vector"""
+        distances = 1.0 - self.matrix[:len(self.keys)] @ vector
+        best = int(np.argmin(distances))
+        return self.keys[best], float(distances[best])
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+class SemanticResponseCache:
+    """LRU cache of generated responses keyed by query embedding and conversation context"""
+
+    def __init__(self, embed: Callable[[List[str]], List], max_entries: int = 5000, max_distance: float = 0.1):
+        """
+        Args:
+            embed: Embedding function mapping a list of texts to vectors
+                   (e.g. the vector store's embedding function)
+            max_entries: Maximum number of cached responses before LRU eviction
+            max_distance: Maximum cosine distance for a query to count as a hit
+        """
+        self.embed = embed
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        # (context_hash, query) -> (response, sources), oldest first
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, List[Dict[str, Any]]]]" = OrderedDict()
+        # context_hash -> embeddings of the entries in that context, so a lookup
+        # is one matrix-vector product without restacking vectors
+        self._by_context: Dict[str, _ContextIndex] = {}
+
+    @staticmethod
+    def context_hash(conversation_history: Optional[str], tools_signature: str = "") -> str:
+        """Hash conversation history and offered tools so entries only match within the same context"""
+        key_source = f"{tools_signature}\x00{conversation_history or ''}"
+        return hashlib.blake2b(key_source.encode(), digest_size=16).hexdigest()
+
+    def _embed_query(self, query: str) -> np.ndarray:
+        """Embed a query and normalize it so cosine distance is 1 - dot product"""
+        vector = np.asarray(self.embed([query])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, query: str, conversation_history: Optional[str] = None,
+               tools_signature: str = "") -> Tuple[np.ndarray, Optional[Tuple[str, List[Dict[str, Any]]]]]:
+        """
+        Look up a cached response for a semantically similar query.
+
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools_signature: Names of the tools offered with the query
+
+        Returns:
+            Tuple of (query embedding, (cached response, its sources) or None).
+            The embedding is returned so a subsequent put() need not embed the
+            query again.
+        """
+        context_hash = self.context_hash(conversation_history, tools_signature)
+        vector = self._embed_query(query)
+
+        with self._lock:
+            index = self._by_context.get(context_hash)
+            if not index:
+                return vector, None
+
+            key, distance = index.nearest(vector)
+            if distance >= self.max_distance:
+                return vector, None
+
+            self._entries.move_to_end(key)
+            return vector, self._entries[key]
+
+    def put(self, query: str, conversation_history: Optional[str], response: str,
+            sources: Optional[List[Dict[str, Any]]] = None, tools_signature: str = "",
+            vector: Optional[np.ndarray] = None):
+        """
+        Store a generated response.
+
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            response: Generated response text
+            sources: Sources the response was based on, returned with it on a hit
+            tools_signature: Names of the tools offered with the query
+            vector: Query embedding from lookup(), computed if not provided
+        """
+        context_hash = self.context_hash(conversation_history, tools_signature)
+        if vector is None:
+            vector = self._embed_query(query)
+        key = (context_hash, query)
+
+        with self._lock:
+            self._entries[key] = (response, list(sources or ()))
+            self._entries.move_to_end(key)
+            index = self._by_context.get(context_hash)
+            if index is None:
+                index = self._by_context[context_hash] = _ContextIndex(len(vector))
+            index.set(key, vector)
+
+            # Evict least recently used entries beyond the bound
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                index = self._by_context[old_key[0]]
+                index.remove(old_key)
+                if not index:
+                    del self._by_context[old_key[0]]
+
+    def clear(self):
+        """Drop all cached responses (e.g. after the course catalog changes)"""
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,3 +1,4 @@
+import copy
 from typing import Dict, Any, Optional, Protocol
 from abc import ABC, abstractmethod
 from vector_store import VectorStore, SearchResults
@@ -210,6 +211,22 @@ class ToolManager:
         self.tools[tool_name] = tool
 
     
+    def for_request(self) -> 'ToolManager':
+        """
+        Return a manager over copies of the registered tools with their own source tracking.
+
+        Tools record sources on themselves, so concurrent requests sharing one
+        manager would read each other's sources. Copies are shallow: they share
+        the vector store and only the tracked sources are per request.
+        """
+        manager = ToolManager()
+        for tool_name, tool in self.tools.items():
+            request_tool = copy.copy(tool)
+            if hasattr(request_tool, 'last_sources'):
+                request_tool.last_sources = []
+            manager.tools[tool_name] = request_tool
+        return manager
+
     def get_tool_definitions(self) -> list:
         """Get all tool definitions for Anthropic tool calling"""
         return [tool.get_tool_definition() for tool in self.tools.values()]
@@ -244,4 +261,12 @@ class ToolManager:
         """Reset sources from all tools that track sources"""
         for tool in self.tools.values():
             if hasattr(tool, 'last_sources'):
-                tool.last_sources = []
\ No newline at end of file
+                tool.last_sources = []
+
+    def restore_sources(self, sources: list):
+        """Replace tracked sources with ones recorded earlier, e.g. alongside a cached response"""
+        self.reset_sources()
+        for tool in self.tools.values():
+            if hasattr(tool, 'last_sources'):
+                tool.last_sources = list(sources)
+                return
\ No newline at end of file
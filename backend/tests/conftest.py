@@ -2,17 +2,225 @@
 Shared fixtures for RAG chatbot tests.
 """
 import pytest
-import sys
-from pathlib import Path
 from unittest.mock import Mock, MagicMock, patch
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from types import SimpleNamespace
 from typing import List, Dict, Any, Optional
 
-# Add backend to path for imports
-backend_path = Path(__file__).parent.parent
-sys.path.insert(0, str(backend_path))
+from vector_store import SearchResults, VectorStore
+import ai_generator
+from ai_generator import AIGenerator
+from rag_system import RAGSystem
+from search_tools import ToolManager
+
+
+# Tool definitions as ToolManager.get_tool_definitions() returns them; shared
+# read-only across tests (AIGenerator copies before adding cache markers)
+SEARCH_TOOL_DEF = {
+    "name": "search_course_content",
+    "description": "Search course materials",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "query": {"type": "string"}
+        },
+        "required": ["query"]
+    }
+}
+OUTLINE_TOOL_DEF = {
+    "name": "get_course_outline",
+    "description": "Get the outline of a course",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "course_title": {"type": "string"}
+        },
+        "required": ["course_title"]
+    }
+}
+SEARCH_TOOL_DEFS = [SEARCH_TOOL_DEF]
+TOOL_DEFS = [OUTLINE_TOOL_DEF, SEARCH_TOOL_DEF]
+
+# Raised by mock_vector_store_raising; built once rather than per test
+_DB_ERR = Exception("Unexpected database error")
+
+
+@dataclass(frozen=True)
+class FakeBlock:
+    """Lightweight stand-in for an Anthropic content block"""
+    type: str
+    text: str = ""
+    id: str = ""
+    name: str = ""
+    input: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class FakeResponse:
+    """
+    Lightweight stand-in for an Anthropic Message response.
+
+    Frozen because the response fixtures are session-scoped and shared by all tests.
+    """
+    stop_reason: str
+    content: List[FakeBlock] = field(default_factory=list)
+
+
+def record_sent_messages(responses):
+    """
+    Build a messages.create side effect that snapshots the messages of each call.
+
+    AIGenerator passes its live message list to the API and keeps extending it,
+    so call_args only shows the final state; the snapshots show what each call sent.
+    """
+    sent = []
+    remaining = iter(responses)
+
+    def create(**kwargs):
+        sent.append(list(kwargs["messages"]))
+        return next(remaining)
+
+    return create, sent
+
+
+def _uncached_client(api_key: str, asynchronous: bool = False):
+    """Stand-in for ai_generator._get_client that builds through the patched classes"""
+    client_class = ai_generator.anthropic.AsyncAnthropic if asynchronous else ai_generator.anthropic.Anthropic
+    return client_class(api_key=api_key)
+
+
+@pytest.fixture(scope="module")
+def anthropic_patch():
+    """
+    Patch the Anthropic clients once per test module.
+
+    AsyncAnthropic is replaced too, so no AIGenerator built in a test holds a
+    real client; tests exercising the async path configure it with
+    mock_async_anthropic_class. _get_client is swapped for an uncached
+    constructor call: each generator picks up the current test's mock client,
+    and no real httpx pool is built per test.
+
+    Returns:
+        Tuple of (mock Anthropic class, mock client)
+    """
+    mock_anthropic_class = Mock()
+    # The monkeypatch fixture is function-scoped, so use its context form here
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("ai_generator.anthropic.Anthropic", mock_anthropic_class)
+        mp.setattr("ai_generator.anthropic.AsyncAnthropic", Mock())
+        mp.setattr("ai_generator._get_client", _uncached_client)
+        yield mock_anthropic_class, mock_anthropic_class.return_value
+
+
+@pytest.fixture
+def anthropic_client(anthropic_patch):
+    """Per-test (mock class, mock client) over the module-wide patch, with fresh call state"""
+    mock_anthropic_class, _ = anthropic_patch
+    mock_anthropic_class.reset_mock(return_value=True, side_effect=True)
+    mock_client = Mock()
+    mock_anthropic_class.return_value = mock_client
+    return mock_anthropic_class, mock_client
+
+
+@pytest.fixture
+def mock_async_anthropic_class(monkeypatch):
+    """Replace anthropic.AsyncAnthropic for one test; construct AIGenerator after configuring it"""
+    mock_async_anthropic_class = Mock()
+    monkeypatch.setattr("ai_generator.anthropic.AsyncAnthropic", mock_async_anthropic_class)
+    return mock_async_anthropic_class
+
+
+@pytest.fixture
+def sequential_client(
+        anthropic_client,
+        mock_anthropic_outline_tool_use_response,
+        mock_anthropic_second_tool_use_response,
+        mock_anthropic_final_response
+):
+    """
+    Mock client wired for an outline search, a content search, then a final answer.
+
+    Returns:
+        Tuple of (mock client, per-call message snapshots)
+    """
+    _, mock_client = anthropic_client
+    mock_client.messages.create.side_effect, sent = record_sent_messages([
+        mock_anthropic_outline_tool_use_response,  # Round 1: get_course_outline
+        mock_anthropic_second_tool_use_response,   # Round 2: search_course_content
+        mock_anthropic_final_response              # Final response without tools
+    ])
+    return mock_client, sent
+
+
+@pytest.fixture(scope="session")
+def search_tool_defs():
+    """Definition list with only the course search tool"""
+    return SEARCH_TOOL_DEFS
+
+
+@pytest.fixture(scope="session")
+def tool_defs():
+    """Definition list with the outline and search tools"""
+    return TOOL_DEFS
+
+
+@pytest.fixture
+def generator(anthropic_client):
+    """
+    Fresh AIGenerator wired to this test's mock client.
+
+    Built per test so no per-instance state (caches, configured tools) leaks
+    between tests; with clients shared via the client cache, construction is cheap.
+    """
+    return AIGenerator(api_key="test-key", model="claude-3-opus")
+
+
+@pytest.fixture(scope="session")
+def rag_config():
+    """Config for RAGSystem tests; read-only, so built once per session"""
+    return SimpleNamespace(
+        CHUNK_SIZE=800,
+        CHUNK_OVERLAP=100,
+        CHROMA_PATH="./test_chroma",
+        EMBEDDING_MODEL="all-MiniLM-L6-v2",
+        ANTHROPIC_API_KEY="test-key",
+        ANTHROPIC_MODEL="claude-3-opus",
+        MAX_RESULTS=5,
+        MAX_HISTORY=2,
+        RESPONSE_CACHE_ENABLED=False,
+        RESPONSE_CACHE_SIZE=5000,
+        RESPONSE_CACHE_MAX_DISTANCE=0.1
+    )
+
+
+@pytest.fixture(scope="class")
+def _rag_system(rag_config):
+    """Build one RAGSystem per test class with its collaborators patched out"""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("rag_system.VectorStore", Mock())
+        mp.setattr("rag_system.DocumentProcessor", Mock())
+        mp.setattr("rag_system.AIGenerator", Mock())
+        mp.setattr("rag_system.SessionManager", Mock())
+        yield RAGSystem(rag_config)
+
+
+@pytest.fixture
+def rag_components():
+    """
+    Fresh collaborator mocks for one test.
 
-from vector_store import SearchResults
+    Returns:
+        Tuple of (AI generator mock, session manager mock) that the rag fixture will use
+    """
+    return Mock(), Mock()
+
+
+@pytest.fixture
+def rag(_rag_system, rag_components, mock_tool_manager):
+    """The class's RAGSystem with this test's AI generator, session manager and tool manager"""
+    _rag_system.ai_generator, _rag_system.session_manager = rag_components
+    _rag_system.tool_manager = mock_tool_manager
+    return _rag_system
 
 
 @pytest.fixture
@@ -62,10 +270,19 @@ def mock_search_results_error():
     )
 
 
+@pytest.fixture(scope="class")
+def _vector_store_mock():
+    """Mock VectorStore shared across a test class; mock_vector_store resets it per test"""
+    # spec limits the mock to VectorStore's real methods, so a misspelled call fails
+    return Mock(spec=VectorStore)
+
+
 @pytest.fixture
-def mock_vector_store(mock_search_results_success):
+def mock_vector_store(_vector_store_mock, mock_search_results_success):
     """Create a mock VectorStore with configurable behavior"""
-    store = Mock()
+    # Reuse the class's mock graph; clear calls and anything the last test configured
+    store = _vector_store_mock
+    store.reset_mock(return_value=True, side_effect=True)
     store.search.return_value = mock_search_results_success
     store._resolve_course_name.return_value = "Python Basics"
     store.get_course_link.return_value = "https://example.com/python"
@@ -84,141 +301,100 @@ def mock_vector_store(mock_search_results_success):
 
 
 @pytest.fixture
-def mock_anthropic_text_response():
-    """Create a mock Anthropic API response for text-only response"""
-    response = Mock()
-    response.stop_reason = "end_turn"
+def mock_vector_store_raising():
+    """Create a mock VectorStore whose search raises, kept apart from the shared mock"""
+    store = Mock(spec=VectorStore)
+    # Drop the previous test's traceback so re-raising doesn't keep extending it
+    store.search.side_effect = _DB_ERR.with_traceback(None)
+    return store
 
-    text_block = Mock()
-    text_block.type = "text"
-    text_block.text = "This is the AI response."
 
-    response.content = [text_block]
-    return response
+@pytest.fixture(scope="session")
+def mock_anthropic_text_response():
+    """Create a mock Anthropic API response for text-only response"""
+    return FakeResponse(
+        stop_reason="end_turn",
+        content=[FakeBlock(type="text", text="This is the AI response.")]
+    )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_anthropic_tool_use_response():
     """Create a mock Anthropic API response with tool use"""
-    response = Mock()
-    response.stop_reason = "tool_use"
-
-    tool_use_block = Mock()
-    tool_use_block.type = "tool_use"
-    tool_use_block.id = "tool_123"
-    tool_use_block.name = "search_course_content"
-    tool_use_block.input = {"query": "What is Python?"}
-
-    response.content = [tool_use_block]
-    return response
+    return FakeResponse(
+        stop_reason="tool_use",
+        content=[FakeBlock(
+            type="tool_use",
+            id="tool_123",
+            name="search_course_content",
+            input={"query": "What is Python?"}
+        )]
+    )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_anthropic_final_response():
     """Create a mock Anthropic API final response after tool execution"""
-    response = Mock()
-    response.stop_reason = "end_turn"
-
-    text_block = Mock()
-    text_block.type = "text"
-    text_block.text = "Based on the search, Python is a programming language."
-
-    response.content = [text_block]
-    return response
+    return FakeResponse(
+        stop_reason="end_turn",
+        content=[FakeBlock(type="text", text="Based on the search, Python is a programming language.")]
+    )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_anthropic_empty_response():
     """Create a mock Anthropic API response with empty content"""
-    response = Mock()
-    response.stop_reason = "end_turn"
-    response.content = []
-    return response
+    return FakeResponse(stop_reason="end_turn", content=[])
 
 
 @pytest.fixture
 def mock_tool_manager():
     """Create a mock ToolManager"""
-    manager = Mock()
-    manager.get_tool_definitions.return_value = [
-        {
-            "name": "search_course_content",
-            "description": "Search course materials",
-            "input_schema": {
-                "type": "object",
-                "properties": {
-                    "query": {"type": "string"}
-                },
-                "required": ["query"]
-            }
-        }
-    ]
+    # Every tool-manager double is Mock(spec=ToolManager): misspelled methods fail,
+    # and unlike create_autospec it skips the per-test walk over every signature
+    manager = Mock(spec=ToolManager)
+    manager.get_tool_definitions.return_value = SEARCH_TOOL_DEFS
     manager.execute_tool.return_value = "[Python Basics - Lesson 1]\nPython is a programming language."
     manager.get_last_sources.return_value = [{"text": "Python Basics - Lesson 1", "link": "https://example.com"}]
     manager.reset_sources.return_value = None
+    # Per-request managers are the same mock, so tests assert on one object
+    manager.for_request.return_value = manager
     return manager
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_anthropic_outline_tool_use_response():
     """Create a mock Anthropic API response requesting get_course_outline tool"""
-    response = Mock()
-    response.stop_reason = "tool_use"
-
-    tool_use_block = Mock()
-    tool_use_block.type = "tool_use"
-    tool_use_block.id = "tool_outline_123"
-    tool_use_block.name = "get_course_outline"
-    tool_use_block.input = {"course_title": "Python Basics"}
-
-    response.content = [tool_use_block]
-    return response
+    return FakeResponse(
+        stop_reason="tool_use",
+        content=[FakeBlock(
+            type="tool_use",
+            id="tool_outline_123",
+            name="get_course_outline",
+            input={"course_title": "Python Basics"}
+        )]
+    )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_anthropic_second_tool_use_response():
     """Create a mock Anthropic API response requesting a second tool (search after outline)"""
-    response = Mock()
-    response.stop_reason = "tool_use"
-
-    tool_use_block = Mock()
-    tool_use_block.type = "tool_use"
-    tool_use_block.id = "tool_search_456"
-    tool_use_block.name = "search_course_content"
-    tool_use_block.input = {"query": "Introduction to Python"}
-
-    response.content = [tool_use_block]
-    return response
+    return FakeResponse(
+        stop_reason="tool_use",
+        content=[FakeBlock(
+            type="tool_use",
+            id="tool_search_456",
+            name="search_course_content",
+            input={"query": "Introduction to Python"}
+        )]
+    )
 
 
 @pytest.fixture
 def mock_tool_manager_sequential():
     """Create a mock ToolManager that returns different results for different tools"""
-    manager = Mock()
-    manager.get_tool_definitions.return_value = [
-        {
-            "name": "get_course_outline",
-            "description": "Get the outline of a course",
-            "input_schema": {
-                "type": "object",
-                "properties": {
-                    "course_title": {"type": "string"}
-                },
-                "required": ["course_title"]
-            }
-        },
-        {
-            "name": "search_course_content",
-            "description": "Search course materials",
-            "input_schema": {
-                "type": "object",
-                "properties": {
-                    "query": {"type": "string"}
-                },
-                "required": ["query"]
-            }
-        }
-    ]
+    manager = Mock(spec=ToolManager)
+    manager.get_tool_definitions.return_value = TOOL_DEFS
 
     def execute_tool_side_effect(tool_name, **kwargs):
         if tool_name == "get_course_outline":
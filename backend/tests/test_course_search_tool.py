@@ -8,83 +8,58 @@ These tests verify the CourseSearchTool correctly:
 - Handles vector store errors
 - Properly formats results and tracks sources
 """
+import re
 import pytest
-import sys
-from pathlib import Path
 from unittest.mock import Mock
 
-# Add backend to path for imports
-backend_path = Path(__file__).parent.parent
-sys.path.insert(0, str(backend_path))
-
 from search_tools import CourseSearchTool
 from vector_store import SearchResults
 
 
+_NO_RESULTS = "No relevant content found"
+_NO_RESULTS_IN_COURSE = re.compile(r"No relevant content found.*Python Basics", re.S)
+_NO_RESULTS_IN_LESSON = re.compile(r"No relevant content found.*lesson 5", re.S)
+
+
 class TestCourseSearchToolExecute:
     """Tests for the execute method of CourseSearchTool"""
 
-    def test_execute_basic_query(self, mock_vector_store, mock_search_results_success):
-        """Test basic query execution returns formatted results"""
+    @pytest.mark.parametrize("kwargs, expected", [
+        pytest.param(
+            {"query": "What is Python?"},
+            {"course_name": None, "lesson_number": None},
+            id="no_filter"
+        ),
+        pytest.param(
+            {"query": "variables", "course_name": "Python Basics"},
+            {"course_name": "Python Basics", "lesson_number": None},
+            id="course_filter"
+        ),
+        pytest.param(
+            {"query": "intro", "lesson_number": 1},
+            {"course_name": None, "lesson_number": 1},
+            id="lesson_filter"
+        ),
+        pytest.param(
+            {"query": "functions", "course_name": "Python", "lesson_number": 3},
+            {"course_name": "Python", "lesson_number": 3},
+            id="both_filters"
+        ),
+    ])
+    def test_execute_filters(self, mock_vector_store, mock_search_results_success, kwargs, expected):
+        """Test that filters are passed to the vector store and results are formatted"""
         mock_vector_store.search.return_value = mock_search_results_success
 
         tool = CourseSearchTool(mock_vector_store)
-        result = tool.execute(query="What is Python?")
+        result = tool.execute(**kwargs)
 
-        # Should call search with correct parameters
-        mock_vector_store.search.assert_called_once_with(
-            query="What is Python?",
-            course_name=None,
-            lesson_number=None
-        )
+        # Should call search with the query and every filter, defaulting to None
+        mock_vector_store.search.assert_called_once_with(query=kwargs["query"], **expected)
 
         # Should return formatted content
-        assert "Python Basics" in result
-        assert "Lesson 1" in result
+        assert result.startswith("[Python Basics - Lesson 1]")
         assert "sample content about Python" in result
 
-    def test_execute_with_course_filter(self, mock_vector_store, mock_search_results_success):
-        """Test query with course_name filter"""
-        mock_vector_store.search.return_value = mock_search_results_success
-
-        tool = CourseSearchTool(mock_vector_store)
-        result = tool.execute(query="variables", course_name="Python Basics")
-
-        mock_vector_store.search.assert_called_once_with(
-            query="variables",
-            course_name="Python Basics",
-            lesson_number=None
-        )
-        assert result is not None
-
-    def test_execute_with_lesson_filter(self, mock_vector_store, mock_search_results_success):
-        """Test query with lesson_number filter"""
-        mock_vector_store.search.return_value = mock_search_results_success
-
-        tool = CourseSearchTool(mock_vector_store)
-        result = tool.execute(query="intro", lesson_number=1)
-
-        mock_vector_store.search.assert_called_once_with(
-            query="intro",
-            course_name=None,
-            lesson_number=1
-        )
-        assert result is not None
-
-    def test_execute_with_both_filters(self, mock_vector_store, mock_search_results_success):
-        """Test query with both course and lesson filters"""
-        mock_vector_store.search.return_value = mock_search_results_success
-
-        tool = CourseSearchTool(mock_vector_store)
-        result = tool.execute(query="functions", course_name="Python", lesson_number=3)
-
-        mock_vector_store.search.assert_called_once_with(
-            query="functions",
-            course_name="Python",
-            lesson_number=3
-        )
-        assert result is not None
-
     def test_execute_no_results(self, mock_vector_store, mock_search_results_empty):
         """Test query with no matching results returns friendly message"""
         mock_vector_store.search.return_value = mock_search_results_empty
@@ -92,7 +67,7 @@ class TestCourseSearchToolExecute:
         tool = CourseSearchTool(mock_vector_store)
         result = tool.execute(query="nonexistent topic")
 
-        assert "No relevant content found" in result
+        assert result.startswith(_NO_RESULTS)
 
     def test_execute_no_results_with_course_filter(self, mock_vector_store, mock_search_results_empty):
         """Test no results message includes course filter context"""
@@ -101,8 +76,7 @@ class TestCourseSearchToolExecute:
         tool = CourseSearchTool(mock_vector_store)
         result = tool.execute(query="xyz", course_name="Python Basics")
 
-        assert "No relevant content found" in result
-        assert "Python Basics" in result
+        assert _NO_RESULTS_IN_COURSE.search(result)
 
     def test_execute_no_results_with_lesson_filter(self, mock_vector_store, mock_search_results_empty):
         """Test no results message includes lesson filter context"""
@@ -111,8 +85,7 @@ class TestCourseSearchToolExecute:
         tool = CourseSearchTool(mock_vector_store)
         result = tool.execute(query="xyz", lesson_number=5)
 
-        assert "No relevant content found" in result
-        assert "lesson 5" in result
+        assert _NO_RESULTS_IN_LESSON.search(result)
 
     def test_execute_vector_store_error(self, mock_vector_store, mock_search_results_error):
         """Test that vector store errors are properly returned"""
@@ -122,7 +95,7 @@ class TestCourseSearchToolExecute:
         result = tool.execute(query="test query")
 
         # Should return the error message
-        assert "Search error" in result
+        assert result.startswith("Search error")
         assert "ChromaDB" in result
 
     def test_execute_course_not_found(self, mock_vector_store):
@@ -139,7 +112,7 @@ class TestCourseSearchToolExecute:
         tool = CourseSearchTool(mock_vector_store)
         result = tool.execute(query="test", course_name="NonExistent Course")
 
-        assert "No course found" in result or "error" in result.lower()
+        assert result.startswith("No course found")
 
 
 class TestCourseSearchToolFormatResults:
@@ -221,15 +194,13 @@ class TestCourseSearchToolEdgeCases:
         # Should still call search
         mock_vector_store.search.assert_called_once()
 
-    def test_execute_vector_store_raises_exception(self, mock_vector_store):
+    def test_execute_vector_store_raises_exception(self, mock_vector_store_raising):
         """Test that unhandled exceptions from vector store propagate.
 
         Note: This tests the CourseSearchTool directly, not through ToolManager.
         When called through ToolManager, exceptions are caught there.
         """
-        mock_vector_store.search.side_effect = Exception("Unexpected database error")
-
-        tool = CourseSearchTool(mock_vector_store)
+        tool = CourseSearchTool(mock_vector_store_raising)
 
         # CourseSearchTool itself doesn't catch exceptions - it relies on
         # VectorStore.search() to catch internally and return SearchResults.error
@@ -7,108 +7,49 @@ These tests verify the RAGSystem correctly:
 - Manages tool execution flow
 - Handles errors properly
 """
+import asyncio
 import pytest
-import sys
-from pathlib import Path
-from unittest.mock import Mock, patch, MagicMock
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
 
-# Add backend to path for imports
-backend_path = Path(__file__).parent.parent
-sys.path.insert(0, str(backend_path))
+from rag_system import RAGSystem
+from response_cache import SemanticResponseCache
+from search_tools import ToolManager, CourseSearchTool
 
 
 class TestRAGSystemQuery:
     """Tests for the RAGSystem.query() method"""
 
-    @patch('rag_system.VectorStore')
-    @patch('rag_system.AIGenerator')
-    @patch('rag_system.DocumentProcessor')
-    @patch('rag_system.SessionManager')
     def test_query_basic(
             self,
-            mock_session_manager_class,
-            mock_doc_processor_class,
-            mock_ai_generator_class,
-            mock_vector_store_class,
-            mock_tool_manager
+            rag_components,
+            mock_tool_manager,
+            rag
     ):
         """Test basic query returns response and sources"""
         # Setup mocks
-        mock_ai_generator = Mock()
+        mock_ai_generator, mock_session_manager = rag_components
         mock_ai_generator.generate_response.return_value = "This is the answer."
-        mock_ai_generator_class.return_value = mock_ai_generator
 
-        mock_session_manager = Mock()
         mock_session_manager.get_conversation_history.return_value = None
-        mock_session_manager_class.return_value = mock_session_manager
-
-        mock_vector_store_class.return_value = Mock()
-        mock_doc_processor_class.return_value = Mock()
-
-        # Create a mock config
-        mock_config = Mock()
-        mock_config.CHUNK_SIZE = 800
-        mock_config.CHUNK_OVERLAP = 100
-        mock_config.CHROMA_PATH = "./test_chroma"
-        mock_config.EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-        mock_config.ANTHROPIC_API_KEY = "test-key"
-        mock_config.ANTHROPIC_MODEL = "claude-3-opus"
-        mock_config.MAX_RESULTS = 5
-        mock_config.MAX_HISTORY = 2
-
-        from rag_system import RAGSystem
-        rag = RAGSystem(mock_config)
-
-        # Mock the tool manager
-        rag.tool_manager = mock_tool_manager
 
         response, sources = rag.query("What is Python?")
 
         assert response == "This is the answer."
         assert sources == mock_tool_manager.get_last_sources()
-        mock_tool_manager.reset_sources.assert_called_once()
+        mock_tool_manager.for_request.assert_called_once()
 
-    @patch('rag_system.VectorStore')
-    @patch('rag_system.AIGenerator')
-    @patch('rag_system.DocumentProcessor')
-    @patch('rag_system.SessionManager')
     def test_query_with_session(
             self,
-            mock_session_manager_class,
-            mock_doc_processor_class,
-            mock_ai_generator_class,
-            mock_vector_store_class
+            rag_components,
+            mock_tool_manager,
+            rag
     ):
         """Test that session history is included in query"""
-        mock_ai_generator = Mock()
+        mock_ai_generator, mock_session_manager = rag_components
         mock_ai_generator.generate_response.return_value = "Answer with context"
-        mock_ai_generator_class.return_value = mock_ai_generator
 
-        mock_session_manager = Mock()
         mock_session_manager.get_conversation_history.return_value = "Previous: Hello"
-        mock_session_manager_class.return_value = mock_session_manager
-
-        mock_vector_store_class.return_value = Mock()
-        mock_doc_processor_class.return_value = Mock()
-
-        mock_config = Mock()
-        mock_config.CHUNK_SIZE = 800
-        mock_config.CHUNK_OVERLAP = 100
-        mock_config.CHROMA_PATH = "./test_chroma"
-        mock_config.EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-        mock_config.ANTHROPIC_API_KEY = "test-key"
-        mock_config.ANTHROPIC_MODEL = "claude-3-opus"
-        mock_config.MAX_RESULTS = 5
-        mock_config.MAX_HISTORY = 2
-
-        from rag_system import RAGSystem
-        rag = RAGSystem(mock_config)
-
-        # Mock tool manager
-        rag.tool_manager = Mock()
-        rag.tool_manager.get_tool_definitions.return_value = []
-        rag.tool_manager.get_last_sources.return_value = []
-        rag.tool_manager.reset_sources.return_value = None
 
         response, sources = rag.query("Follow-up", session_id="session_1")
 
@@ -116,154 +57,123 @@ class TestRAGSystemQuery:
         mock_session_manager.get_conversation_history.assert_called_with("session_1")
 
         # Check that generate_response received history
-        call_kwargs = mock_ai_generator.generate_response.call_args.kwargs
+        mock_ai_generator.generate_response.assert_called_once()
+        _, call_kwargs = mock_ai_generator.generate_response.call_args
         assert call_kwargs["conversation_history"] == "Previous: Hello"
 
         # Check that exchange was added
         mock_session_manager.add_exchange.assert_called_once()
 
-    @patch('rag_system.VectorStore')
-    @patch('rag_system.AIGenerator')
-    @patch('rag_system.DocumentProcessor')
-    @patch('rag_system.SessionManager')
-    def test_query_sources_reset(
+    def test_query_sources_from_request_manager(
             self,
-            mock_session_manager_class,
-            mock_doc_processor_class,
-            mock_ai_generator_class,
-            mock_vector_store_class
+            rag_components,
+            mock_tool_manager,
+            rag
     ):
-        """Test that sources are reset after retrieval"""
-        mock_ai_generator = Mock()
+        """Test that tools run and sources are read on a per-request tool manager"""
+        mock_ai_generator, mock_session_manager = rag_components
         mock_ai_generator.generate_response.return_value = "Answer"
-        mock_ai_generator_class.return_value = mock_ai_generator
 
-        mock_session_manager = Mock()
         mock_session_manager.get_conversation_history.return_value = None
-        mock_session_manager_class.return_value = mock_session_manager
-
-        mock_vector_store_class.return_value = Mock()
-        mock_doc_processor_class.return_value = Mock()
-
-        mock_config = Mock()
-        mock_config.CHUNK_SIZE = 800
-        mock_config.CHUNK_OVERLAP = 100
-        mock_config.CHROMA_PATH = "./test_chroma"
-        mock_config.EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-        mock_config.ANTHROPIC_API_KEY = "test-key"
-        mock_config.ANTHROPIC_MODEL = "claude-3-opus"
-        mock_config.MAX_RESULTS = 5
-        mock_config.MAX_HISTORY = 2
-
-        from rag_system import RAGSystem
-        rag = RAGSystem(mock_config)
-
-        # Mock tool manager
-        mock_tool_manager = Mock()
-        mock_tool_manager.get_tool_definitions.return_value = []
-        mock_tool_manager.get_last_sources.return_value = [{"text": "Source 1"}]
-        mock_tool_manager.reset_sources.return_value = None
-        rag.tool_manager = mock_tool_manager
 
         rag.query("Test query")
 
-        # Verify reset was called after get
+        # The request's manager is handed to the generator and then read once
+        mock_tool_manager.for_request.assert_called_once()
+        _, call_kwargs = mock_ai_generator.generate_response.call_args
+        assert call_kwargs["tool_manager"] is mock_tool_manager.for_request.return_value
         mock_tool_manager.get_last_sources.assert_called_once()
-        mock_tool_manager.reset_sources.assert_called_once()
+        # It is discarded after the request, so shared sources are never reset
+        mock_tool_manager.reset_sources.assert_not_called()
+
+
+    def test_aquery_with_session(
+            self,
+            rag_components,
+            mock_tool_manager,
+            rag
+    ):
+        """Test that the async query path awaits the generator and records the exchange"""
+        mock_ai_generator, mock_session_manager = rag_components
+        mock_ai_generator.agenerate_response = AsyncMock(return_value="Async answer")
+
+        mock_session_manager.get_conversation_history.return_value = "Previous: Hello"
+
+        response, sources = asyncio.run(rag.aquery("Follow-up", session_id="session_1"))
+
+        assert response == "Async answer"
+        assert sources == mock_tool_manager.get_last_sources()
+        mock_ai_generator.agenerate_response.assert_awaited_once()
+        _, call_kwargs = mock_ai_generator.agenerate_response.await_args
+        assert call_kwargs["conversation_history"] == "Previous: Hello"
+        mock_ai_generator.generate_response.assert_not_called()
+        mock_session_manager.add_exchange.assert_called_once_with("session_1", "Follow-up", "Async answer")
+
+
+    def test_query_stream_events(
+            self,
+            rag_components,
+            mock_tool_manager,
+            rag
+    ):
+        """Test that streamed text is followed by a sources event and the final answer is recorded"""
+        mock_ai_generator, mock_session_manager = rag_components
+
+        def stream():
+            yield "Let me search. "
+            yield "Python is a language."
+            return "Python is a language."
+
+        mock_ai_generator.generate_response_stream.return_value = stream()
+
+        mock_session_manager.get_conversation_history.return_value = None
+
+        events = list(rag.query_stream("What is Python?", session_id="session_1"))
+
+        assert events[:2] == [
+            {"type": "text", "text": "Let me search. "},
+            {"type": "text", "text": "Python is a language."}
+        ]
+        assert events[2] == {"type": "sources", "sources": mock_tool_manager.get_last_sources()}
+        mock_tool_manager.for_request.assert_called_once()
+        # History gets the generator's final text, not the streamed preamble
+        mock_session_manager.add_exchange.assert_called_once_with(
+            "session_1", "What is Python?", "Python is a language."
+        )
 
 
 class TestRAGSystemErrorPropagation:
     """Tests for error propagation in RAGSystem"""
 
-    @patch('rag_system.VectorStore')
-    @patch('rag_system.AIGenerator')
-    @patch('rag_system.DocumentProcessor')
-    @patch('rag_system.SessionManager')
     def test_query_ai_generator_error(
             self,
-            mock_session_manager_class,
-            mock_doc_processor_class,
-            mock_ai_generator_class,
-            mock_vector_store_class
+            rag_components,
+            mock_tool_manager,
+            rag
     ):
         """Test that AI generator errors are handled gracefully"""
-        mock_ai_generator = Mock()
+        mock_ai_generator, mock_session_manager = rag_components
         # With the fix, errors return error messages instead of raising
         mock_ai_generator.generate_response.return_value = "API error occurred: Connection failed"
-        mock_ai_generator_class.return_value = mock_ai_generator
 
-        mock_session_manager = Mock()
         mock_session_manager.get_conversation_history.return_value = None
-        mock_session_manager_class.return_value = mock_session_manager
-
-        mock_vector_store_class.return_value = Mock()
-        mock_doc_processor_class.return_value = Mock()
-
-        mock_config = Mock()
-        mock_config.CHUNK_SIZE = 800
-        mock_config.CHUNK_OVERLAP = 100
-        mock_config.CHROMA_PATH = "./test_chroma"
-        mock_config.EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-        mock_config.ANTHROPIC_API_KEY = "test-key"
-        mock_config.ANTHROPIC_MODEL = "claude-3-opus"
-        mock_config.MAX_RESULTS = 5
-        mock_config.MAX_HISTORY = 2
-
-        from rag_system import RAGSystem
-        rag = RAGSystem(mock_config)
-
-        # Mock tool manager
-        rag.tool_manager = Mock()
-        rag.tool_manager.get_tool_definitions.return_value = []
-        rag.tool_manager.get_last_sources.return_value = []
-        rag.tool_manager.reset_sources.return_value = None
 
         # With the fix, errors are returned as messages, not raised
         response, sources = rag.query("Test query")
         assert "error" in response.lower()
 
-    @patch('rag_system.VectorStore')
-    @patch('rag_system.AIGenerator')
-    @patch('rag_system.DocumentProcessor')
-    @patch('rag_system.SessionManager')
     def test_query_tool_manager_error(
             self,
-            mock_session_manager_class,
-            mock_doc_processor_class,
-            mock_ai_generator_class,
-            mock_vector_store_class
+            rag_components,
+            mock_tool_manager,
+            rag
     ):
         """Test that tool manager errors are handled gracefully"""
-        mock_ai_generator = Mock()
+        mock_ai_generator, mock_session_manager = rag_components
         # With the fix, tool errors are caught and passed to Claude as tool results
         mock_ai_generator.generate_response.return_value = "I encountered an error while searching."
-        mock_ai_generator_class.return_value = mock_ai_generator
 
-        mock_session_manager = Mock()
         mock_session_manager.get_conversation_history.return_value = None
-        mock_session_manager_class.return_value = mock_session_manager
-
-        mock_vector_store_class.return_value = Mock()
-        mock_doc_processor_class.return_value = Mock()
-
-        mock_config = Mock()
-        mock_config.CHUNK_SIZE = 800
-        mock_config.CHUNK_OVERLAP = 100
-        mock_config.CHROMA_PATH = "./test_chroma"
-        mock_config.EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-        mock_config.ANTHROPIC_API_KEY = "test-key"
-        mock_config.ANTHROPIC_MODEL = "claude-3-opus"
-        mock_config.MAX_RESULTS = 5
-        mock_config.MAX_HISTORY = 2
-
-        from rag_system import RAGSystem
-        rag = RAGSystem(mock_config)
-
-        # Mock tool manager
-        rag.tool_manager = Mock()
-        rag.tool_manager.get_tool_definitions.return_value = []
-        rag.tool_manager.get_last_sources.return_value = []
-        rag.tool_manager.reset_sources.return_value = None
 
         # With the fix, errors are handled gracefully
         response, sources = rag.query("Test query")
@@ -273,55 +183,56 @@ class TestRAGSystemErrorPropagation:
 class TestRAGSystemToolFlow:
     """Tests for the complete tool execution flow through RAGSystem"""
 
-    @patch('rag_system.VectorStore')
-    @patch('rag_system.AIGenerator')
-    @patch('rag_system.DocumentProcessor')
-    @patch('rag_system.SessionManager')
     def test_query_tool_execution_flow(
             self,
-            mock_session_manager_class,
-            mock_doc_processor_class,
-            mock_ai_generator_class,
-            mock_vector_store_class,
-            mock_tool_manager
+            rag_components,
+            mock_tool_manager,
+            rag
     ):
         """Test full tool execution flow works end-to-end"""
-        mock_ai_generator = Mock()
+        mock_ai_generator, mock_session_manager = rag_components
         mock_ai_generator.generate_response.return_value = "Answer based on search"
-        mock_ai_generator_class.return_value = mock_ai_generator
 
-        mock_session_manager = Mock()
         mock_session_manager.get_conversation_history.return_value = None
-        mock_session_manager_class.return_value = mock_session_manager
 
-        mock_vector_store_class.return_value = Mock()
-        mock_doc_processor_class.return_value = Mock()
+        response, sources = rag.query("What is Python?")
 
-        mock_config = Mock()
-        mock_config.CHUNK_SIZE = 800
-        mock_config.CHUNK_OVERLAP = 100
-        mock_config.CHROMA_PATH = "./test_chroma"
-        mock_config.EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-        mock_config.ANTHROPIC_API_KEY = "test-key"
-        mock_config.ANTHROPIC_MODEL = "claude-3-opus"
-        mock_config.MAX_RESULTS = 5
-        mock_config.MAX_HISTORY = 2
+        # Verify AI generator was given the request's tool manager
+        mock_ai_generator.generate_response.assert_called_once()
+        _, call_kwargs = mock_ai_generator.generate_response.call_args
+        # Tools come from the payload configured at construction, not per call
+        assert "tools" not in call_kwargs
+        assert call_kwargs["question"] == "What is Python?"
+        assert call_kwargs["tool_manager"] is mock_tool_manager
 
-        from rag_system import RAGSystem
-        rag = RAGSystem(mock_config)
-        rag.tool_manager = mock_tool_manager
+        # Verify sources were retrieved
+        assert sources is mock_tool_manager.get_last_sources.return_value
 
-        response, sources = rag.query("What is Python?")
+    def test_tools_configured_at_construction(self, monkeypatch, rag_config):
+        """Test that RAGSystem hands its tool definitions to the generator once, when built"""
+        mock_ai_generator = Mock()
+        monkeypatch.setattr("rag_system.VectorStore", Mock())
+        monkeypatch.setattr("rag_system.DocumentProcessor", Mock())
+        monkeypatch.setattr("rag_system.AIGenerator", Mock(return_value=mock_ai_generator))
+        monkeypatch.setattr("rag_system.SessionManager", Mock())
 
-        # Verify AI generator was called with tools
-        call_kwargs = mock_ai_generator.generate_response.call_args.kwargs
-        assert "tools" in call_kwargs
-        assert "tool_manager" in call_kwargs
-        assert call_kwargs["tools"] == mock_tool_manager.get_tool_definitions()
-        assert call_kwargs["tool_manager"] == mock_tool_manager
+        rag = RAGSystem(rag_config)
 
-        # Verify sources were retrieved
-        assert sources == mock_tool_manager.get_last_sources()
+        mock_ai_generator.configure_tools.assert_called_once_with(rag.tool_manager.get_tool_definitions())
+
+    @pytest.mark.parametrize("enabled", [False, True])
+    def test_semantic_cache_opt_in(self, monkeypatch, rag_config, enabled):
+        """Test that the semantic response cache is only built when enabled in config"""
+        mock_ai_generator_class = Mock()
+        monkeypatch.setattr("rag_system.VectorStore", Mock())
+        monkeypatch.setattr("rag_system.DocumentProcessor", Mock())
+        monkeypatch.setattr("rag_system.AIGenerator", mock_ai_generator_class)
+        monkeypatch.setattr("rag_system.SessionManager", Mock())
+
+        rag = RAGSystem(SimpleNamespace(**{**vars(rag_config), "RESPONSE_CACHE_ENABLED": enabled}))
+
+        assert isinstance(rag.response_cache, SemanticResponseCache) is enabled
+        assert mock_ai_generator_class.call_args.args[2] is rag.response_cache
 
 
 class TestToolManagerExecuteTool:
@@ -329,8 +240,6 @@ class TestToolManagerExecuteTool:
 
     def test_execute_tool_success(self, mock_vector_store):
         """Test successful tool execution"""
-        from search_tools import ToolManager, CourseSearchTool
-
         manager = ToolManager()
         tool = CourseSearchTool(mock_vector_store)
         manager.register_tool(tool)
@@ -342,25 +251,51 @@ class TestToolManagerExecuteTool:
 
     def test_execute_tool_not_found(self):
         """Test execution of non-existent tool"""
-        from search_tools import ToolManager
-
         manager = ToolManager()
         result = manager.execute_tool("nonexistent_tool", query="test")
 
         assert "not found" in result.lower()
 
-    def test_execute_tool_exception_handled(self, mock_vector_store):
+    def test_execute_tool_exception_handled(self, mock_vector_store_raising):
         """Test that tool exceptions are now caught by ToolManager"""
-        from search_tools import ToolManager, CourseSearchTool
-
-        # Make vector store raise an exception
-        mock_vector_store.search.side_effect = Exception("Database error")
-
         manager = ToolManager()
-        tool = CourseSearchTool(mock_vector_store)
+        tool = CourseSearchTool(mock_vector_store_raising)
         manager.register_tool(tool)
 
         # With the fix, ToolManager catches exceptions and returns error message
         result = manager.execute_tool("search_course_content", query="test")
         assert "error" in result.lower()
         assert "database error" in result.lower()
+
+
+class TestToolManagerSources:
+    """Tests for ToolManager source tracking"""
+
+    def test_restore_sources_replaces_tracked_sources(self, mock_vector_store):
+        """Test that restored sources are what get_last_sources returns next"""
+        manager = ToolManager()
+        tool = CourseSearchTool(mock_vector_store)
+        manager.register_tool(tool)
+        tool.last_sources = [{"text": "Old", "link": None}]
+
+        restored = [{"text": "Python Basics - Lesson 1", "link": "https://example.com"}]
+        manager.restore_sources(restored)
+
+        assert manager.get_last_sources() == restored
+        assert manager.get_last_sources() is not restored
+
+    def test_for_request_isolates_sources(self, mock_vector_store):
+        """Test that per-request managers track sources apart from each other and the shared one"""
+        manager = ToolManager()
+        manager.register_tool(CourseSearchTool(mock_vector_store))
+
+        first, second = manager.for_request(), manager.for_request()
+        first.execute_tool("search_course_content", query="Python")
+
+        assert first.get_last_sources() == [
+            {"text": "Python Basics - Lesson 1", "link": "https://example.com/python/lesson1"}
+        ]
+        assert second.get_last_sources() == []
+        assert manager.get_last_sources() == []
+        assert first.tools["search_course_content"].store is mock_vector_store
+